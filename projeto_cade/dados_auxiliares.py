@@ -1,10 +1,10 @@
 ramos_dict = {
-        : [
+    "Agropecuária e Pesca": [
         "Agricultura", "Produção de sementes e mudas", "Pecuária",
         "Atividades de caça", "Produção florestal", "Pesca e aquicultura",
         "Atividades de apoio à agricultura, pecuária, pesca, caça e produção florestal"
     ],
-    : [
+    "Extrativismo e Mineração": [
         "Extração e beneficiamento de carvão mineral",
         "Extração e beneficiamento de petróleo, gás natural, xisto e areias betuminosas",
         "Extração e beneficiamento de minério de ferro",
@@ -70,6 +70,6 @@ ramos_dict = {
         "Serviços administrativos diversos"
     ]
 }
-regioes = ramos_dict.keys()
-print(regioes)
+# Congelar a lista de ramos: o dicionário nunca muda depois do import
+regioes = tuple(ramos_dict)
 
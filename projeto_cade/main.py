@@ -3,14 +3,34 @@ Script principal para processamento e análise de documentos do CADE.
 """
 
 import os
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import matplotlib.pyplot as plt
 import seaborn as sns
+from joblib import Parallel, delayed
 from src.data_processing.extractor import aplicar_extracao_ao_dataframe
 from src.data_processing.descriptive import gerar_relatorio_estatistico
 from src.data_processing.visualization import gerar_todas_visualizacoes
 from src.data_processing.inference import treinar_modelo_inferencial, visualizar_importancia_features, visualizar_matriz_confusao
 
+def salvar_csv(df, caminho):
+    """
+    Salva um DataFrame em CSV usando o escritor do pyarrow, que roda em C
+    com múltiplas threads. Tipos que o Arrow não consegue escrever em CSV
+    (por exemplo colunas de listas) caem no to_csv do pandas.
+
+    Args:
+        df (DataFrame): DataFrame a salvar
+        caminho (str): Caminho do arquivo CSV de saída
+    """
+    try:
+        pacsv.write_csv(pa.Table.from_pandas(df, preserve_index=False), caminho)
+    except pa.ArrowException:
+        df.to_csv(caminho, index=False)
+
 def processar_dados_cade(caminho_arquivo, diretorio_saida='output'):
     """
     Processa os dados do CADE e gera análises.
@@ -23,8 +43,47 @@ def processar_dados_cade(caminho_arquivo, diretorio_saida='output'):
         dict: Dicionário com resultados do processamento
     """
     print(f"Carregando dados do arquivo: {caminho_arquivo}")
-    # Carregar dados
-    df = pd.read_parquet(caminho_arquivo)
+    # Carregar apenas as colunas usadas pelo pipeline (projection pushdown)
+    # e empurrar o filtro de ano para o leitor Parquet, que descarta
+    # row groups inteiros pelas estatísticas de min/max sem descomprimi-los
+    colunas_necessarias = [
+        'descricao_tipo_processo',
+        'descricao_tipo_documento',
+        'ano_documento',
+        'corpo_texto_formatado',
+        'corpo_texto',
+        'conteudo',
+        'descricao_titulo_documento',
+        'decisao_tribunal'
+    ]
+    schema = pq.read_schema(caminho_arquivo)
+    colunas = [c for c in colunas_necessarias if c in schema.names]
+
+    filtros = None
+    if 'ano_documento' in schema.names:
+        tipo_ano = schema.field('ano_documento').type
+        # Só é possível empurrar o filtro se a coluna já for numérica
+        if pa.types.is_integer(tipo_ano) or pa.types.is_floating(tipo_ano):
+            filtros = [('ano_documento', '>', 2012)]
+
+    # Os filtros de tipo de processo/documento exigem strip/lower e por isso
+    # continuam sendo aplicados em pandas, sobre um volume já reduzido
+    df = pq.read_table(caminho_arquivo, columns=colunas or None, filters=filtros).to_pandas()
+
+    # Colunas de texto como string[pyarrow]: buffers Arrow contíguos em vez de
+    # um objeto Python por célula, e as operações .str despacham para kernels
+    # vetorizados do Arrow (menos memória e mais rápido nas colunas grandes)
+    colunas_string = [
+        'descricao_tipo_processo',
+        'descricao_tipo_documento',
+        'corpo_texto_formatado',
+        'corpo_texto',
+        'conteudo',
+        'descricao_titulo_documento'
+    ]
+    for coluna in colunas_string:
+        if coluna in df.columns:
+            df[coluna] = df[coluna].astype('string[pyarrow]')
     print(f"Dados carregados com sucesso. Shape: {df.shape}")
     
     # Criar diretório de saída se não existir
@@ -36,20 +95,41 @@ def processar_dados_cade(caminho_arquivo, diretorio_saida='output'):
     df['ano_documento'] = pd.to_numeric(df.get('ano_documento', 0), errors='coerce')
     
     # Passo 2: Filtrar processos administrativos
+    # Normalizar apenas as categorias distintas (poucas) em vez de cada linha
     print("Filtrando processos administrativos...")
+    tipo_processo = df['descricao_tipo_processo'].astype('category')
+    # Guardar o resultado da conversão: as etapas seguintes reutilizam os
+    # códigos de categoria em vez de normalizar as strings de novo
+    df['descricao_tipo_processo'] = tipo_processo
+    categorias_admin = [
+        c for c in tipo_processo.cat.categories
+        if 'processo administrativo' in str(c).lower()
+    ]
     df_admin = df[
-        df['descricao_tipo_processo'].str.lower().str.contains('processo administrativo') &
+        tipo_processo.isin(categorias_admin) &
         (df['ano_documento'] > 2012)
     ].copy()
     print(f"Processos administrativos filtrados: {df_admin.shape[0]}")
-    
-    # Passo 3: Filtrar documentos de voto
+
+    # Passo 3: Filtrar documentos de voto (mesma técnica de categorias)
     print("Filtrando documentos de voto...")
-    df_votos = df_admin[df_admin['descricao_tipo_documento'].str.strip().str.lower().isin([
+    tipos_voto = {
         "voto",
         "voto processo administrativo",
         "voto embargos de declaração"
-    ])].copy()
+    }
+    tipo_documento = df_admin['descricao_tipo_documento'].astype('category')
+    df_admin['descricao_tipo_documento'] = tipo_documento
+    categorias_voto = [
+        c for c in tipo_documento.cat.categories
+        if str(c).strip().lower() in tipos_voto
+    ]
+    df_votos = df_admin[tipo_documento.isin(categorias_voto)].copy()
+    # Descartar categorias que não sobraram após o filtro, para que os
+    # agrupamentos adiante enxerguem apenas os tipos realmente presentes
+    df_votos['descricao_tipo_documento'] = (
+        df_votos['descricao_tipo_documento'].cat.remove_unused_categories()
+    )
     print(f"Documentos de voto filtrados: {df_votos.shape[0]}")
     
     # Passo 4: Verificar e concatenar colunas de texto
@@ -66,19 +146,37 @@ def processar_dados_cade(caminho_arquivo, diretorio_saida='output'):
     if not colunas_existentes:
         raise ValueError("Nenhuma das colunas textuais candidatas existe no DataFrame.")
     
-    df_votos['texto_completo'] = df_votos[colunas_existentes].fillna('').astype(str).agg(' '.join, axis=1)
+    # str.cat concatena a coluna inteira em C, sem o ' '.join por linha em Python
+    texto_completo = df_votos[colunas_existentes[0]].fillna('').astype(str)
+    for coluna in colunas_existentes[1:]:
+        texto_completo = texto_completo.str.cat(
+            df_votos[coluna].fillna('').astype(str), sep=' '
+        )
+    df_votos['texto_completo'] = texto_completo
     
     # Passo 5: Identificar pessoa jurídica
     print("Identificando pessoas jurídicas...")
     
     # Passo 6: Extrair percentuais de multa e elementos de dosimetria
+    # A extração é independente por linha, então para volumes grandes o
+    # DataFrame é dividido em pedaços processados em paralelo (um processo
+    # por núcleo); em volumes pequenos o overhead dos processos não compensa
     print("Extraindo percentuais de multa e elementos de dosimetria...")
-    df_processado = aplicar_extracao_ao_dataframe(df_votos)
+    num_nucleos = os.cpu_count() or 1
+    if num_nucleos > 1 and len(df_votos) >= 10000:
+        indices = np.array_split(np.arange(len(df_votos)), num_nucleos)
+        partes = [df_votos.iloc[ix] for ix in indices if len(ix) > 0]
+        resultados_partes = Parallel(n_jobs=-1, backend='loky')(
+            delayed(aplicar_extracao_ao_dataframe)(parte) for parte in partes
+        )
+        df_processado = pd.concat(resultados_partes)
+    else:
+        df_processado = aplicar_extracao_ao_dataframe(df_votos)
     print(f"Extração concluída. Shape: {df_processado.shape}")
     
     # Salvar DataFrame processado
     caminho_df_processado = os.path.join(diretorio_saida, 'df_processado.csv')
-    df_processado.to_csv(caminho_df_processado, index=False)
+    salvar_csv(df_processado, caminho_df_processado)
     print(f"DataFrame processado salvo em: {caminho_df_processado}")
     
     # Passo 7: Gerar estatísticas descritivas
@@ -87,13 +185,13 @@ def processar_dados_cade(caminho_arquivo, diretorio_saida='output'):
     
     # Salvar estatísticas em formato CSV
     caminho_estatisticas_gerais = os.path.join(diretorio_saida, 'estatisticas_gerais.csv')
-    pd.DataFrame([estatisticas['estatisticas_gerais']]).to_csv(caminho_estatisticas_gerais, index=False)
+    salvar_csv(pd.DataFrame([estatisticas['estatisticas_gerais']]), caminho_estatisticas_gerais)
     
     caminho_estatisticas_ano = os.path.join(diretorio_saida, 'estatisticas_por_ano.csv')
-    pd.DataFrame(estatisticas['estatisticas_por_ano']).to_csv(caminho_estatisticas_ano, index=False)
+    salvar_csv(pd.DataFrame(estatisticas['estatisticas_por_ano']), caminho_estatisticas_ano)
     
     caminho_estatisticas_tipo = os.path.join(diretorio_saida, 'estatisticas_por_tipo.csv')
-    pd.DataFrame(estatisticas['estatisticas_por_tipo']).to_csv(caminho_estatisticas_tipo, index=False)
+    salvar_csv(pd.DataFrame(estatisticas['estatisticas_por_tipo']), caminho_estatisticas_tipo)
     
     print(f"Estatísticas salvas em: {diretorio_saida}")
     
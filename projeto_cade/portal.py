@@ -1,6 +1,5 @@
 from shiny import App, ui, render
 import os
-import matplotlib.pyplot as plt
 from dados_auxiliares import regioes
 
 
@@ -111,6 +110,10 @@ def server(input, output, session):
     @output
     @render.plot
     def grafico_dashboard():
+        # Import adiado: o matplotlib só é carregado quando o gráfico do
+        # dashboard é de fato renderizado, encurtando o cold-start do Shiny
+        import matplotlib.pyplot as plt
+
         # Exemplo: muda cor com base no filtro de região
         cor = {
             "norte": "blue",
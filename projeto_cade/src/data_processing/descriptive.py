@@ -4,6 +4,8 @@ Módulo para cálculo de estatísticas descritivas sobre os dados do CADE.
 
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 import matplotlib.pyplot as plt
 import seaborn as sns
 from typing import Dict, Any, Optional, List, Union
@@ -163,9 +165,12 @@ def calcular_correlacao_dosimetria_multa(df: pd.DataFrame) -> Dict[str, float]:
     # Calcular correlações
     correlacoes = {}
     for col in colunas_validas:
-        # Converter booleanos para inteiros (0/1)
+        # Converter booleanos (inclusive os anuláveis) para 0/1 em float,
+        # com NA virando NaN
         if pd.api.types.is_bool_dtype(df[col]):
-            serie_temp = df[col].astype(int)
+            serie_temp = pd.Series(
+                df[col].to_numpy(dtype='float64', na_value=np.nan), index=df.index
+            )
         else:
             serie_temp = df[col]
         
@@ -188,27 +193,34 @@ def gerar_relatorio_estatistico(df: pd.DataFrame) -> Dict[str, Any]:
         dict: Dicionário com todas as estatísticas calculadas
     """
     relatorio = {}
-    
+
+    # Filtrar as linhas com percentual de multa uma única vez e repassar o
+    # resultado: cada sub-função fazia seu próprio dropna sobre o DataFrame
+    # completo, repetindo a mesma varredura quatro vezes
+    df_com_percentual = df.dropna(subset=['percentual_multa']) if 'percentual_multa' in df.columns else df
+
     # Estatísticas gerais sobre percentuais de multa
-    relatorio['estatisticas_gerais'] = calcular_estatisticas_multas(df)
-    
+    relatorio['estatisticas_gerais'] = calcular_estatisticas_multas(df_com_percentual)
+
     # Estatísticas por ano
-    relatorio['estatisticas_por_ano'] = calcular_estatisticas_por_ano(df).to_dict('records')
-    
+    relatorio['estatisticas_por_ano'] = calcular_estatisticas_por_ano(df_com_percentual).to_dict('records')
+
     # Estatísticas por tipo de documento
-    relatorio['estatisticas_por_tipo'] = calcular_estatisticas_por_tipo_documento(df).to_dict('records')
-    
+    relatorio['estatisticas_por_tipo'] = calcular_estatisticas_por_tipo_documento(df_com_percentual).to_dict('records')
+
     # Distribuição de percentuais
-    relatorio['distribuicao_percentuais'] = calcular_distribuicao_percentuais(df)
+    relatorio['distribuicao_percentuais'] = calcular_distribuicao_percentuais(df_com_percentual)
     
     # Correlações com dosimetria
     relatorio['correlacoes_dosimetria'] = calcular_correlacao_dosimetria_multa(df)
     
-    # Contagem de condenações vs. arquivamentos
+    # Contagem de condenações vs. arquivamentos usando os kernels vetorizados
+    # do Arrow (utf8_lower + match_substring em buffers contíguos), em vez de
+    # um apply com str(x).lower() por linha
     if 'decisao_tribunal' in df.columns:
-        decisoes = df['decisao_tribunal'].apply(lambda x: str(x).lower())
-        condenacoes = decisoes.str.contains('condenação').sum()
-        arquivamentos = decisoes.str.contains('arquivamento').sum()
+        decisoes = pc.utf8_lower(pa.array(df['decisao_tribunal'].astype(str), type=pa.string()))
+        condenacoes = pc.sum(pc.match_substring(decisoes, 'condenação')).as_py() or 0
+        arquivamentos = pc.sum(pc.match_substring(decisoes, 'arquivamento')).as_py() or 0
         relatorio['contagem_decisoes'] = {
             'condenacoes': condenacoes,
             'arquivamentos': arquivamentos,
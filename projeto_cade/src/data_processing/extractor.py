@@ -6,6 +6,79 @@ import re
 import pandas as pd
 import numpy as np
 
+# O google-re2 usa um motor DFA de tempo linear (sem backtracking), bem mais
+# rápido para varrer textos longos. É opcional: sem ele, cai no re padrão.
+try:
+    import re2 as _motor_regex
+except ImportError:
+    _motor_regex = re
+
+def _compilar(padrao):
+    """Compila com re2 quando disponível, senão com o re padrão."""
+    try:
+        return _motor_regex.compile(padrao)
+    except Exception:
+        # re2 não suporta todas as construções do re; usar o padrão nesse caso
+        return re.compile(padrao)
+
+# Padrões compilados uma única vez no carregamento do módulo, para evitar
+# recompilação a cada linha do DataFrame
+
+# Padrões para identificar percentuais de multa
+_PADROES_PERCENTUAL = [_compilar(p) for p in (
+    r'multa\s+de\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento',
+    r'(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento\s+(?:bruto|líquido)?',
+    r'percentual\s+de\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento',
+    r'pena\s+pecuniária\s+(?:de|no\s+valor\s+de)\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento',
+    r'multa\s+(?:de|no\s+valor\s+de)\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento',
+    r'aplicação\s+de\s+multa\s+de\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento',
+    r'condenação\s+(?:de|ao\s+pagamento\s+de)\s+multa\s+de\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento',
+    r'condenação\s+(?:de|ao\s+pagamento\s+de)\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento'
+)]
+
+# Padrões para identificar valores monetários
+_PADROES_REAIS = [_compilar(p) for p in (
+    r'multa\s+de\s+r\$\s*(\d+[.,]?\d*(?:\.\d+)*)',
+    r'multa\s+no\s+valor\s+de\s+r\$\s*(\d+[.,]?\d*(?:\.\d+)*)',
+    r'pena\s+pecuniária\s+de\s+r\$\s*(\d+[.,]?\d*(?:\.\d+)*)',
+    r'condenação\s+(?:de|ao\s+pagamento\s+de)\s+r\$\s*(\d+[.,]?\d*(?:\.\d+)*)'
+)]
+
+# Padrões para elementos de dosimetria (alternativas combinadas em um único
+# padrão para percorrer o texto uma vez só)
+_RE_REINCIDENCIA = re.compile(r'reincid[êe]ncia|reincidente')
+_RE_BOA_FE = re.compile(r'boa[- ]f[ée]')
+_RE_MA_FE = re.compile(r'm[áa][- ]f[ée]')
+_RE_COOPERACAO = re.compile(r'cooper[ao][çc][ãa]o|colabor[ao][çc][ãa]o')
+_RE_GRAVIDADE = re.compile(r'(alta|elevada|grave|baixa|leve|média|moderada)\s+gravidade')
+_RE_DURACAO = re.compile(r'conduta\s+(?:por|durante)\s+(\d+)\s+(anos?|meses?|dias?)')
+
+# Alternação única com grupos nomeados: percorre o texto uma só vez em vez de
+# seis buscas independentes (os textos de voto podem ter dezenas de KB)
+_RE_DOSIMETRIA = _compilar(
+    r'(?P<reinc>reincid[êe]ncia|reincidente)'
+    r'|(?P<boa>boa[- ]f[ée])'
+    r'|(?P<ma>m[áa][- ]f[ée])'
+    r'|(?P<coop>cooper[ao][çc][ãa]o|colabor[ao][çc][ãa]o)'
+    r'|(?P<grav_nivel>alta|elevada|grave|baixa|leve|média|moderada)\s+gravidade'
+    r'|conduta\s+(?:por|durante)\s+(?P<dur_valor>\d+)\s+(?P<dur_unidade>anos?|meses?|dias?)'
+)
+
+# Versões combinadas dos padrões acima, com os contextos reunidos em uma única
+# alternação não capturante e um só grupo de captura, para uso vetorizado com
+# Series.str.extractall (uma passada em C sobre a coluna inteira)
+_RE_PERCENTUAL_VETORIZADO = re.compile(
+    r'(?:multa\s+de\s+|percentual\s+de\s+|pena\s+pecuniária\s+(?:de|no\s+valor\s+de)\s+|'
+    r'multa\s+(?:de|no\s+valor\s+de)\s+|aplicação\s+de\s+multa\s+de\s+|'
+    r'condenação\s+(?:de|ao\s+pagamento\s+de)\s+(?:multa\s+de\s+)?)?'
+    r'(?P<pct>\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento'
+)
+_RE_REAIS_VETORIZADO = re.compile(
+    r'(?:multa\s+(?:de|no\s+valor\s+de)|pena\s+pecuniária\s+de|'
+    r'condenação\s+(?:de|ao\s+pagamento\s+de))\s+r\$\s*'
+    r'(?P<valor>\d+[.,]?\d*(?:\.\d+)*)'
+)
+
 def extrair_percentual_multa(texto):
     """
     Extrai percentuais de faturamento mencionados como multa no texto.
@@ -20,22 +93,10 @@ def extrair_percentual_multa(texto):
         return None
     
     texto = texto.lower()
-    
-    # Padrões para identificar percentuais de multa
-    padroes = [
-        r'multa\s+de\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento',
-        r'(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento\s+(?:bruto|líquido)?',
-        r'percentual\s+de\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento',
-        r'pena\s+pecuniária\s+(?:de|no\s+valor\s+de)\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento',
-        r'multa\s+(?:de|no\s+valor\s+de)\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento',
-        r'aplicação\s+de\s+multa\s+de\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento',
-        r'condenação\s+(?:de|ao\s+pagamento\s+de)\s+multa\s+de\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento',
-        r'condenação\s+(?:de|ao\s+pagamento\s+de)\s+(\d+[.,]?\d*)%\s+(?:do|de|sobre)?\s+(?:seu)?\s+faturamento'
-    ]
-    
+
     resultados = []
-    for padrao in padroes:
-        matches = re.findall(padrao, texto)
+    for padrao in _PADROES_PERCENTUAL:
+        matches = padrao.findall(texto)
         for match in matches:
             try:
                 # Substituir vírgula por ponto e converter para float
@@ -62,18 +123,10 @@ def extrair_valor_multa_reais(texto):
         return None
     
     texto = texto.lower()
-    
-    # Padrões para identificar valores monetários
-    padroes = [
-        r'multa\s+de\s+r\$\s*(\d+[.,]?\d*(?:\.\d+)*)',
-        r'multa\s+no\s+valor\s+de\s+r\$\s*(\d+[.,]?\d*(?:\.\d+)*)',
-        r'pena\s+pecuniária\s+de\s+r\$\s*(\d+[.,]?\d*(?:\.\d+)*)',
-        r'condenação\s+(?:de|ao\s+pagamento\s+de)\s+r\$\s*(\d+[.,]?\d*(?:\.\d+)*)'
-    ]
-    
+
     resultados = []
-    for padrao in padroes:
-        matches = re.findall(padrao, texto)
+    for padrao in _PADROES_REAIS:
+        matches = padrao.findall(texto)
         for match in matches:
             try:
                 # Remover pontos de separação de milhar e substituir vírgula por ponto
@@ -89,18 +142,27 @@ def extrair_valor_multa_reais(texto):
 def extrair_elementos_dosimetria(texto):
     """
     Extrai elementos relacionados à dosimetria da pena.
-    
+
     Args:
         texto (str): Texto do documento
-        
+
     Returns:
         dict: Dicionário com elementos de dosimetria encontrados
     """
     if not isinstance(texto, str):
         return {}
-    
-    texto = texto.lower()
-    
+
+    return _extrair_dosimetria_minusculo(texto.lower())
+
+def _extrair_dosimetria_minusculo(texto):
+    """
+    Variante interna de extrair_elementos_dosimetria que assume texto
+    já em minúsculas, para evitar cópias redundantes da string quando a
+    coluna inteira já foi normalizada de uma vez.
+    """
+    if not isinstance(texto, str):
+        return {}
+
     elementos = {
         'reincidencia': False,
         'boa_fe': False,
@@ -110,41 +172,49 @@ def extrair_elementos_dosimetria(texto):
         'duracao_conduta': None
     }
     
-    # Verificar reincidência
-    if re.search(r'reincid[êe]ncia', texto) or re.search(r'reincidente', texto):
-        elementos['reincidencia'] = True
-    
-    # Verificar boa-fé
-    if re.search(r'boa[- ]f[ée]', texto):
-        elementos['boa_fe'] = True
-    
-    # Verificar má-fé
-    if re.search(r'm[áa][- ]f[ée]', texto):
-        elementos['ma_fe'] = True
-    
-    # Verificar cooperação
-    if re.search(r'cooper[ao][çc][ãa]o', texto) or re.search(r'colabor[ao][çc][ãa]o', texto):
-        elementos['cooperacao'] = True
-    
-    # Extrair gravidade
-    gravidade_match = re.search(r'(alta|elevada|grave|baixa|leve|média|moderada)\s+gravidade', texto)
-    if gravidade_match:
-        elementos['gravidade'] = gravidade_match.group(1)
-    
-    # Extrair duração da conduta
-    duracao_match = re.search(r'conduta\s+(?:por|durante)\s+(\d+)\s+(anos?|meses?|dias?)', texto)
-    if duracao_match:
-        valor = int(duracao_match.group(1))
-        unidade = duracao_match.group(2)
-        
-        # Normalizar para meses
-        if 'ano' in unidade:
-            valor *= 12
-        elif 'dia' in unidade:
-            valor = valor / 30  # Aproximação
-        
-        elementos['duracao_conduta'] = valor
-    
+    # Uma única varredura do texto: cada match indica qual elemento foi
+    # encontrado pelo grupo nomeado correspondente
+    pendentes = len(elementos)
+    for match in _RE_DOSIMETRIA.finditer(texto):
+        if match.group('reinc'):
+            if not elementos['reincidencia']:
+                elementos['reincidencia'] = True
+                pendentes -= 1
+        elif match.group('boa'):
+            if not elementos['boa_fe']:
+                elementos['boa_fe'] = True
+                pendentes -= 1
+        elif match.group('ma'):
+            if not elementos['ma_fe']:
+                elementos['ma_fe'] = True
+                pendentes -= 1
+        elif match.group('coop'):
+            if not elementos['cooperacao']:
+                elementos['cooperacao'] = True
+                pendentes -= 1
+        elif match.group('grav_nivel'):
+            # Manter a primeira ocorrência, como no re.search original
+            if elementos['gravidade'] is None:
+                elementos['gravidade'] = match.group('grav_nivel')
+                pendentes -= 1
+        elif match.group('dur_valor'):
+            if elementos['duracao_conduta'] is None:
+                valor = int(match.group('dur_valor'))
+                unidade = match.group('dur_unidade')
+
+                # Normalizar para meses
+                if 'ano' in unidade:
+                    valor *= 12
+                elif 'dia' in unidade:
+                    valor = valor / 30  # Aproximação
+
+                elementos['duracao_conduta'] = valor
+                pendentes -= 1
+
+        # Interromper cedo quando todos os elementos já foram encontrados
+        if pendentes == 0:
+            break
+
     return elementos
 
 def aplicar_extracao_ao_dataframe(df, coluna_texto='texto_completo'):
@@ -158,32 +228,78 @@ def aplicar_extracao_ao_dataframe(df, coluna_texto='texto_completo'):
     Returns:
         DataFrame: DataFrame com colunas adicionais de extração
     """
-    # Criar cópia para não modificar o original
-    df_resultado = df.copy()
-    
-    # Extrair percentuais de multa
-    df_resultado['percentuais_multa'] = df_resultado[coluna_texto].apply(extrair_percentual_multa)
-    
+    # Em vez de copiar o DataFrame inteiro (o que duplicaria a coluna de
+    # texto, normalmente a maior alocação), acumular as novas colunas em um
+    # DataFrame auxiliar alinhado pelo índice e concatenar uma única vez
+    extraido = pd.DataFrame(index=df.index)
+
+    # Normalizar o texto uma única vez para as extrações vetorizadas
+    texto_lower = df[coluna_texto].str.lower()
+
+    # Pré-filtro barato por substring antes dos regex caros: todos os padrões
+    # de percentual exigem a palavra "faturamento", então o extractall só
+    # precisa rodar nas linhas que a contêm (a maioria dos votos não contém)
+    com_faturamento = texto_lower.str.contains('faturamento', regex=False, na=False)
+
+    # Extrair percentuais de multa com uma única passada do regex combinado
+    # sobre a coluna inteira (extractall roda em C, sem loop por linha)
+    matches_pct = texto_lower[com_faturamento].str.extractall(_RE_PERCENTUAL_VETORIZADO)['pct']
+    percentuais = pd.to_numeric(matches_pct.str.replace(',', '.', regex=False), errors='coerce')
+    # Filtrar valores absurdos (acima de 100%)
+    percentuais = percentuais.dropna()
+    percentuais = percentuais[percentuais <= 100]
+    # Lista completa e primeiro valor num único groupby; astype(object) fixa
+    # o dtype da coluna de listas: sem nenhum match na coluna inteira, o
+    # agg(list) vazio sairia numérico e o reindex produziria uma coluna float
+    # em vez de listas/None (o que também quebrava o .str[0] usado antes aqui)
+    agregado_pct = percentuais.groupby(level=0).agg(
+        [('primeiro', 'first'), ('lista', list)]
+    ).reindex(df.index)
+    extraido['percentuais_multa'] = agregado_pct['lista'].astype(object)
+
     # Extrair o primeiro percentual (geralmente o mais relevante)
-    df_resultado['percentual_multa'] = df_resultado['percentuais_multa'].apply(
-        lambda x: x[0] if isinstance(x, list) and len(x) > 0 else None
-    )
-    
-    # Extrair valores monetários
-    df_resultado['valores_multa_reais'] = df_resultado[coluna_texto].apply(extrair_valor_multa_reais)
-    
+    extraido['percentual_multa'] = agregado_pct['primeiro']
+
+    # Extrair valores monetários da mesma forma ("r$" é obrigatório no padrão)
+    com_reais = texto_lower.str.contains('r$', regex=False, na=False)
+    matches_reais = texto_lower[com_reais].str.extractall(_RE_REAIS_VETORIZADO)['valor']
+    # Uma única passada: remove o separador de milhar e troca vírgula por ponto
+    valores_reais = pd.to_numeric(
+        matches_reais.str.translate({ord('.'): None, ord(','): '.'}),
+        errors='coerce'
+    ).dropna()
+    agregado_reais = valores_reais.groupby(level=0).agg(
+        [('primeiro', 'first'), ('lista', list)]
+    ).reindex(df.index)
+    extraido['valores_multa_reais'] = agregado_reais['lista'].astype(object)
+
     # Extrair o primeiro valor monetário
-    df_resultado['valor_multa_reais'] = df_resultado['valores_multa_reais'].apply(
-        lambda x: x[0] if isinstance(x, list) and len(x) > 0 else None
+    extraido['valor_multa_reais'] = agregado_reais['primeiro']
+
+    # Flags de dosimetria diretamente via str.contains vetorizado, guardadas
+    # como boolean anulável (1 bit por célula + máscara, em vez de um objeto
+    # Python por linha; linhas sem texto ficam como NA)
+    extraido['dosimetria_reincidencia'] = texto_lower.str.contains(_RE_REINCIDENCIA).astype('boolean')
+    extraido['dosimetria_boa_fe'] = texto_lower.str.contains(_RE_BOA_FE).astype('boolean')
+    extraido['dosimetria_ma_fe'] = texto_lower.str.contains(_RE_MA_FE).astype('boolean')
+    extraido['dosimetria_cooperacao'] = texto_lower.str.contains(_RE_COOPERACAO).astype('boolean')
+
+    # Gravidade: str.extract devolve a primeira ocorrência, como o re.search
+    # (com o mesmo pré-filtro por substring obrigatória)
+    com_gravidade = texto_lower.str.contains('gravidade', regex=False, na=False)
+    extraido['dosimetria_gravidade'] = (
+        texto_lower[com_gravidade].str.extract(_RE_GRAVIDADE, expand=False).reindex(df.index)
     )
-    
-    # Extrair elementos de dosimetria
-    df_resultado['elementos_dosimetria'] = df_resultado[coluna_texto].apply(extrair_elementos_dosimetria)
-    
-    # Expandir elementos de dosimetria em colunas separadas
-    for elemento in ['reincidencia', 'boa_fe', 'ma_fe', 'cooperacao', 'gravidade', 'duracao_conduta']:
-        df_resultado[f'dosimetria_{elemento}'] = df_resultado['elementos_dosimetria'].apply(
-            lambda x: x.get(elemento) if isinstance(x, dict) else None
-        )
-    
-    return df_resultado
+
+    # Duração da conduta, normalizada para meses de forma vetorizada
+    com_conduta = texto_lower.str.contains('conduta', regex=False, na=False)
+    duracao = texto_lower[com_conduta].str.extract(_RE_DURACAO).reindex(df.index)
+    valor = pd.to_numeric(duracao[0], errors='coerce')
+    unidade = duracao[1]
+    extraido['dosimetria_duracao_conduta'] = np.select(
+        [unidade.str.contains('ano', na=False), unidade.str.contains('dia', na=False)],
+        [valor * 12, valor / 30],  # dias: aproximação de 30 dias/mês
+        default=valor
+    )
+
+    return pd.concat([df, extraido], axis=1)
@@ -6,28 +6,69 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
+from scipy.stats import gaussian_kde
+from joblib import Parallel, delayed
 from typing import Optional, List, Dict, Any, Union
 import os
 
+def _matriz_correlacao(df_corr: pd.DataFrame) -> pd.DataFrame:
+    """
+    Calcula a matriz de correlação de Pearson com exclusão par a par de NaN,
+    como df.corr(), mas em meia dúzia de produtos de matrizes BLAS sobre um
+    buffer float32 contíguo, em vez do laço por par de colunas do pandas.
+
+    Args:
+        df_corr (DataFrame): DataFrame apenas com colunas numéricas
+
+    Returns:
+        DataFrame: Matriz de correlação k x k
+    """
+    arr = np.ascontiguousarray(df_corr.to_numpy(dtype=np.float32, na_value=np.nan))
+    validos = (~np.isnan(arr)).astype(np.float32)
+    valores = np.nan_to_num(arr)
+    quadrados = valores * valores
+
+    # Somas restritas às linhas em que ambas as colunas do par são válidas
+    n = validos.T @ validos
+    soma_x = valores.T @ validos
+    soma_xy = valores.T @ valores
+    soma_xx = quadrados.T @ validos
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = soma_xy - soma_x * soma_x.T / n
+        var_x = soma_xx - soma_x * soma_x / n
+        corr = cov / np.sqrt(var_x * var_x.T)
+
+    return pd.DataFrame(corr, index=df_corr.columns, columns=df_corr.columns)
+
+# Cada atribuição em plt.rcParams passa pelos validadores do matplotlib;
+# como todo gerar_* chama a configuração de estilo, o flag garante que esse
+# custo seja pago uma única vez por processo
+_estilo_configurado = False
+
 def configurar_estilo_visualizacoes():
     """
-    Configura o estilo padrão para as visualizações.
+    Configura o estilo padrão para as visualizações (uma vez por processo).
     """
+    global _estilo_configurado
+    if _estilo_configurado:
+        return
+    _estilo_configurado = True
+
     # Configurar estilo seaborn
     sns.set_style("whitegrid")
-    
-    # Configurar tamanho padrão das figuras
-    plt.rcParams["figure.figsize"] = (12, 8)
-    
-    # Configurar fonte para suportar caracteres especiais
-    plt.rcParams['font.family'] = 'DejaVu Sans'
-    
-    # Configurar tamanho dos textos
-    plt.rcParams['axes.titlesize'] = 16
-    plt.rcParams['axes.labelsize'] = 14
-    plt.rcParams['xtick.labelsize'] = 12
-    plt.rcParams['ytick.labelsize'] = 12
-    plt.rcParams['legend.fontsize'] = 12
+
+    # Tamanho das figuras, fonte com suporte a caracteres especiais e tamanho
+    # dos textos, num único update em lote
+    plt.rcParams.update({
+        'figure.figsize': (12, 8),
+        'font.family': 'DejaVu Sans',
+        'axes.titlesize': 16,
+        'axes.labelsize': 14,
+        'xtick.labelsize': 12,
+        'ytick.labelsize': 12,
+        'legend.fontsize': 12
+    })
 
 def gerar_histograma_multas(df: pd.DataFrame, 
                            coluna_percentual: str = 'percentual_multa',
@@ -52,39 +93,57 @@ def gerar_histograma_multas(df: pd.DataFrame,
     if len(percentuais) == 0:
         return None
     
-    # Criar figura
-    plt.figure()
-    
-    # Gerar histograma com KDE
-    sns.histplot(percentuais, kde=True, bins=15)
+    # Criar figura (API orientada a objetos: nada fica pendurado no registro
+    # global do pyplot, o que importa com as figuras geradas em paralelo)
+    fig, ax = plt.subplots()
+    
+    # Gerar histograma com KDE; a KDE do seaborn avalia o kernel gaussiano
+    # por par ponto-grade e fica quadrática na prática para amostras grandes,
+    # então acima de 2000 pontos a curva é pré-avaliada em 200 pontos de grade
+    # e desenhada por cima, na mesma escala de contagem do histograma
+    kde_seaborn = len(percentuais) <= 2000
+    sns.histplot(percentuais, kde=kde_seaborn, bins=15, ax=ax)
+    if not kde_seaborn:
+        valores = percentuais.to_numpy()
+        # Amostras (quase) constantes deixam a covariância do KDE singular e
+        # a largura de bin nula; nesses casos o histograma sai sem a curva
+        if valores.min() < valores.max():
+            grade = np.linspace(valores.min(), valores.max(), 200)
+            try:
+                densidade = gaussian_kde(valores, bw_method='silverman')(grade)
+            except np.linalg.LinAlgError:
+                pass
+            else:
+                largura_bin = (valores.max() - valores.min()) / 15
+                ax.plot(grade, densidade * len(valores) * largura_bin, color='C0')
     
     # Configurar rótulos
-    plt.title('Distribuição de Percentuais de Multa sobre Faturamento')
-    plt.xlabel('Percentual de Multa (%)')
-    plt.ylabel('Frequência')
-    plt.grid(True, alpha=0.3)
+    ax.set_title('Distribuição de Percentuais de Multa sobre Faturamento')
+    ax.set_xlabel('Percentual de Multa (%)')
+    ax.set_ylabel('Frequência')
+    ax.grid(True, alpha=0.3)
     
     # Adicionar linha vertical com a média
     media = percentuais.mean()
-    plt.axvline(media, color='red', linestyle='--', 
-                label=f'Média: {media:.2f}%')
+    ax.axvline(media, color='red', linestyle='--', 
+               label=f'Média: {media:.2f}%')
     
     # Adicionar linha vertical com a mediana
     mediana = percentuais.median()
-    plt.axvline(mediana, color='green', linestyle='-', 
-                label=f'Mediana: {mediana:.2f}%')
+    ax.axvline(mediana, color='green', linestyle='-', 
+               label=f'Mediana: {mediana:.2f}%')
     
-    plt.legend()
+    ax.legend()
     
     # Salvar figura se caminho for especificado
     if output_path:
-        plt.tight_layout()
-        plt.savefig(output_path)
-        plt.close()
+        fig.tight_layout()
+        fig.savefig(output_path)
+        plt.close(fig)
         return output_path
     else:
         plt.show()
-        plt.close()
+        plt.close(fig)
         return None
 
 def gerar_grafico_evolucao_temporal(df: pd.DataFrame,
@@ -112,56 +171,63 @@ def gerar_grafico_evolucao_temporal(df: pd.DataFrame,
     if len(df_filtrado) == 0:
         return None
     
-    # Agrupar por ano e calcular estatísticas
-    stats_por_ano = df_filtrado.groupby(coluna_ano)[coluna_percentual].agg([
-        'mean', 'median', 'count'
-    ]).reset_index()
+    # Agrupar por ano e calcular estatísticas; observed=True evita expandir
+    # categorias sem observações caso o ano venha como Categorical, e o sort
+    # explícito no final ordena só os g grupos em vez do groupby ordenar as
+    # linhas todas
+    stats_por_ano = df_filtrado.groupby(coluna_ano, observed=True, sort=False)[
+        coluna_percentual
+    ].agg(['mean', 'median', 'count']).reset_index().sort_values(coluna_ano)
     
     # Criar figura
-    plt.figure()
+    fig, ax = plt.subplots()
     
     # Plotar média e mediana
-    plt.plot(stats_por_ano[coluna_ano], stats_por_ano['mean'], 
-             marker='o', linestyle='-', color='blue', 
-             label='Média')
+    ax.plot(stats_por_ano[coluna_ano], stats_por_ano['mean'], 
+            marker='o', linestyle='-', color='blue', 
+            label='Média')
     
-    plt.plot(stats_por_ano[coluna_ano], stats_por_ano['median'], 
-             marker='s', linestyle='--', color='green', 
-             label='Mediana')
+    ax.plot(stats_por_ano[coluna_ano], stats_por_ano['median'], 
+            marker='s', linestyle='--', color='green', 
+            label='Mediana')
     
     # Adicionar contagem como tamanho dos pontos
     tamanhos = stats_por_ano['count'] * 10  # Multiplicador para melhor visualização
-    plt.scatter(stats_por_ano[coluna_ano], stats_por_ano['mean'], 
-                s=tamanhos, alpha=0.5, color='blue')
+    ax.scatter(stats_por_ano[coluna_ano], stats_por_ano['mean'], 
+               s=tamanhos, alpha=0.5, color='blue')
     
     # Configurar rótulos
-    plt.title('Evolução Temporal dos Percentuais de Multa')
-    plt.xlabel('Ano')
-    plt.ylabel('Percentual de Multa (%)')
-    plt.grid(True, alpha=0.3)
+    ax.set_title('Evolução Temporal dos Percentuais de Multa')
+    ax.set_xlabel('Ano')
+    ax.set_ylabel('Percentual de Multa (%)')
+    ax.grid(True, alpha=0.3)
     
     # Configurar eixo x para mostrar todos os anos
-    plt.xticks(stats_por_ano[coluna_ano])
-    
-    # Adicionar anotações com contagem
-    for i, row in stats_por_ano.iterrows():
-        plt.annotate(f"n={int(row['count'])}", 
-                    (row[coluna_ano], row['mean']),
+    ax.set_xticks(stats_por_ano[coluna_ano])
+    
+    # Adicionar anotações com contagem, iterando sobre arrays numpy em vez de
+    # iterrows, que materializa uma Series por linha
+    anos = stats_por_ano[coluna_ano].to_numpy()
+    medias = stats_por_ano['mean'].to_numpy()
+    contagens = stats_por_ano['count'].to_numpy().astype(int)
+    for ano, media_ano, contagem in zip(anos, medias, contagens):
+        ax.annotate(f"n={contagem}",
+                    (ano, media_ano),
                     textcoords="offset points",
                     xytext=(0,10),
                     ha='center')
     
-    plt.legend()
+    ax.legend()
     
     # Salvar figura se caminho for especificado
     if output_path:
-        plt.tight_layout()
-        plt.savefig(output_path)
-        plt.close()
+        fig.tight_layout()
+        fig.savefig(output_path)
+        plt.close(fig)
         return output_path
     else:
         plt.show()
-        plt.close()
+        plt.close(fig)
         return None
 
 def gerar_boxplot_por_tipo_documento(df: pd.DataFrame,
@@ -190,33 +256,35 @@ def gerar_boxplot_por_tipo_documento(df: pd.DataFrame,
         return None
     
     # Criar figura
-    plt.figure()
+    fig, ax = plt.subplots()
     
     # Gerar boxplot
-    sns.boxplot(x=coluna_tipo, y=coluna_percentual, data=df_filtrado)
+    sns.boxplot(x=coluna_tipo, y=coluna_percentual, data=df_filtrado, ax=ax)
     
-    # Adicionar pontos individuais
-    sns.stripplot(x=coluna_tipo, y=coluna_percentual, data=df_filtrado, 
-                 size=4, color=".3", alpha=0.6)
+    # Adicionar pontos individuais; com muitos pontos, rasterizar a camada
+    # evita um elemento vetorial por observação no arquivo salvo
+    sns.stripplot(x=coluna_tipo, y=coluna_percentual, data=df_filtrado,
+                 size=4, color=".3", alpha=0.6,
+                 rasterized=len(df_filtrado) > 500, ax=ax)
     
     # Configurar rótulos
-    plt.title('Distribuição de Percentuais de Multa por Tipo de Documento')
-    plt.xlabel('Tipo de Documento')
-    plt.ylabel('Percentual de Multa (%)')
-    plt.grid(True, alpha=0.3)
+    ax.set_title('Distribuição de Percentuais de Multa por Tipo de Documento')
+    ax.set_xlabel('Tipo de Documento')
+    ax.set_ylabel('Percentual de Multa (%)')
+    ax.grid(True, alpha=0.3)
     
     # Rotacionar rótulos do eixo x para melhor legibilidade
-    plt.xticks(rotation=45, ha='right')
+    plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
     
     # Salvar figura se caminho for especificado
     if output_path:
-        plt.tight_layout()
-        plt.savefig(output_path)
-        plt.close()
+        fig.tight_layout()
+        fig.savefig(output_path)
+        plt.close(fig)
         return output_path
     else:
         plt.show()
-        plt.close()
+        plt.close(fig)
         return None
 
 def gerar_grafico_correlacao_dosimetria(df: pd.DataFrame,
@@ -234,48 +302,43 @@ def gerar_grafico_correlacao_dosimetria(df: pd.DataFrame,
     # Configurar estilo
     configurar_estilo_visualizacoes()
     
-    # Colunas de dosimetria numéricas ou booleanas
-    colunas_dosimetria = [col for col in df.columns if col.startswith('dosimetria_')]
-    
-    # Filtrar apenas colunas numéricas ou booleanas
-    colunas_validas = []
-    for col in colunas_dosimetria:
-        if pd.api.types.is_numeric_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col]):
-            colunas_validas.append(col)
-    
-    if not colunas_validas or 'percentual_multa' not in df.columns:
+    # Colunas de dosimetria numéricas ou booleanas, selecionadas numa única
+    # passada por prefixo + dtype, sem checar coluna a coluna em Python; a
+    # conversão de booleanos para 0/1 fica a cargo do to_numpy da matriz de
+    # correlação, que já trata NA como NaN
+    sub = df.filter(regex=r'^dosimetria_').select_dtypes(
+        include=['number', 'bool', 'boolean']
+    )
+
+    if sub.empty or 'percentual_multa' not in df.columns:
         return None
-    
-    # Criar DataFrame para correlação
-    df_corr = df[colunas_validas + ['percentual_multa']].copy()
-    
-    # Converter booleanos para inteiros (0/1)
-    for col in colunas_validas:
-        if pd.api.types.is_bool_dtype(df_corr[col]):
-            df_corr[col] = df_corr[col].astype(int)
-    
+
+    # Criar DataFrame para correlação (join referencia as colunas existentes,
+    # sem copiar o subconjunto inteiro)
+    df_corr = sub.join(df['percentual_multa'])
+
     # Calcular matriz de correlação
-    corr_matrix = df_corr.corr()
+    corr_matrix = _matriz_correlacao(df_corr)
     
     # Criar figura
-    plt.figure(figsize=(10, 8))
+    fig, ax = plt.subplots(figsize=(10, 8))
     
     # Gerar heatmap
     sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', vmin=-1, vmax=1, 
-               fmt='.2f', linewidths=0.5)
+               fmt='.2f', linewidths=0.5, ax=ax)
     
     # Configurar rótulos
-    plt.title('Correlação entre Elementos de Dosimetria e Percentuais de Multa')
+    ax.set_title('Correlação entre Elementos de Dosimetria e Percentuais de Multa')
     
     # Salvar figura se caminho for especificado
     if output_path:
-        plt.tight_layout()
-        plt.savefig(output_path)
-        plt.close()
+        fig.tight_layout()
+        fig.savefig(output_path)
+        plt.close(fig)
         return output_path
     else:
         plt.show()
-        plt.close()
+        plt.close(fig)
         return None
 
 def gerar_todas_visualizacoes(df: pd.DataFrame, diretorio_saida: str) -> Dict[str, str]:
@@ -291,23 +354,19 @@ def gerar_todas_visualizacoes(df: pd.DataFrame, diretorio_saida: str) -> Dict[st
     """
     # Criar diretório se não existir
     os.makedirs(diretorio_saida, exist_ok=True)
-    
-    caminhos = {}
-    
-    # Gerar histograma de multas
-    caminho_histograma = os.path.join(diretorio_saida, 'histograma_multas.png')
-    caminhos['histograma'] = gerar_histograma_multas(df, output_path=caminho_histograma)
-    
-    # Gerar gráfico de evolução temporal
-    caminho_evolucao = os.path.join(diretorio_saida, 'evolucao_temporal.png')
-    caminhos['evolucao_temporal'] = gerar_grafico_evolucao_temporal(df, output_path=caminho_evolucao)
-    
-    # Gerar boxplot por tipo de documento
-    caminho_boxplot = os.path.join(diretorio_saida, 'boxplot_tipo_documento.png')
-    caminhos['boxplot'] = gerar_boxplot_por_tipo_documento(df, output_path=caminho_boxplot)
-    
-    # Gerar gráfico de correlação
-    caminho_correlacao = os.path.join(diretorio_saida, 'correlacao_dosimetria.png')
-    caminhos['correlacao'] = gerar_grafico_correlacao_dosimetria(df, output_path=caminho_correlacao)
-    
-    return caminhos
+
+    # As quatro figuras são independentes (cada uma com seu groupby e seu
+    # render), então são geradas em processos paralelos; cada processo usa o
+    # backend Agg do matplotlib e o loky compartilha o df grande por memmap
+    tarefas = [
+        ('histograma', gerar_histograma_multas, 'histograma_multas.png'),
+        ('evolucao_temporal', gerar_grafico_evolucao_temporal, 'evolucao_temporal.png'),
+        ('boxplot', gerar_boxplot_por_tipo_documento, 'boxplot_tipo_documento.png'),
+        ('correlacao', gerar_grafico_correlacao_dosimetria, 'correlacao_dosimetria.png')
+    ]
+    resultados = Parallel(n_jobs=4, backend='loky')(
+        delayed(funcao)(df, output_path=os.path.join(diretorio_saida, arquivo))
+        for _, funcao, arquivo in tarefas
+    )
+
+    return {nome: caminho for (nome, _, _), caminho in zip(tarefas, resultados)}